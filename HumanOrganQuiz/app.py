@@ -11,13 +11,15 @@
 ###############################################################################
 
 # Import necessary libraries
+import hashlib
 import os
 import sys
 import random
 import json
 import shutil
+import threading
 import uuid
-import time
+import concurrent.futures
 from flask import Flask, request, jsonify, session, send_from_directory
 # NOTE: The AWSImgGen class is assumed to be defined in a separate file.
 from AWSImgGen import AWSImgGen
@@ -37,21 +39,90 @@ class HumanOrganQuiz:
         """
         # Initialize the Flask application
         self.app = Flask(__name__)
-        self.app.secret_key = os.urandom(24)
+        # Stable secret so every gunicorn worker validates the same session
+        # cookies; quiz.service provides QUIZ_SECRET_KEY. The random
+        # fallback is for single-process development runs only.
+        self.app.secret_key = os.environ.get('QUIZ_SECRET_KEY') or os.urandom(24)
+
+        # Server-side sessions: when REDIS_URL is set (and flask-session is
+        # installed), session state lives in Redis and the cookie carries
+        # only a session id, instead of HMAC-signing and round-tripping a
+        # growing JSON blob on every request. Cookie sessions remain the
+        # fallback so the app still runs without Redis.
+        redis_url = os.environ.get('REDIS_URL')
+        if redis_url:
+            try:
+                import redis
+                from flask_session import Session
+                self.app.config['SESSION_TYPE'] = 'redis'
+                self.app.config['SESSION_REDIS'] = redis.Redis.from_url(redis_url)
+                self.app.config['PERMANENT_SESSION_LIFETIME'] = 600
+                Session(self.app)
+            except ImportError:
+                print("REDIS_URL is set but redis/flask-session is not installed; using cookie sessions.")
 
         # Create an instance of the AWS Image Generation class
         self.img_gen = AWSImgGen()
 
         # Load the list of human organs from a file
         self.organs = self._load_quiz_data(quiz_data_file)
+        self._n = len(self.organs)
         
         # Ensure the static directory exists for serving images
-        if not os.path.exists('static'):
-            os.makedirs('static')
+        os.makedirs('static', exist_ok=True)
+
+        # Per-organ image cache under static/cache/: the prompt for an organ
+        # is deterministic, so one generated image per organ can be reused
+        # forever. The in-memory index is rebuilt from disk at startup so
+        # restarts keep their hits; its size is bounded by the organ list.
+        self._cache_dir = os.path.join('static', 'cache')
+        os.makedirs(self._cache_dir, exist_ok=True)
+        self._img_cache = {}
+        # Single-flight bookkeeping: at most one generation per organ runs
+        # at a time; concurrent requesters wait and reuse its result
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        for organ in self.organs:
+            stem = self._cache_stem(organ)
+            for ext in ('.webp', '.png'):
+                if os.path.exists(os.path.join(self._cache_dir, stem + ext)):
+                    self._img_cache[organ] = f"cache/{stem}{ext}"
+                    break
+
+        # Optionally pre-generate every missing organ image during boot so
+        # even the first /get_question per organ is a cache hit. Gated
+        # behind an env var to keep dev startups cheap; the submissions are
+        # fire-and-forget and fan out across Bedrock connections.
+        if os.environ.get('QUIZ_WARM_CACHE') == '1':
+            warm_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+            for organ in self.organs:
+                if organ not in self._img_cache:
+                    warm_pool.submit(self._generate_and_cache, organ)
+            warm_pool.shutdown(wait=False)
+
+        # Read the quiz page once at startup; index() serves the cached
+        # string instead of re-reading the file per request
+        with open('index.html', 'r', encoding='utf-8') as f:
+            self._index_html = f.read()
 
         # Register the routes with the Flask application
         self._register_routes()
 
+    @staticmethod
+    def _cache_stem(name):
+        """
+        Turns an organ name into an opaque cache filename stem. A hash is
+        used rather than the name itself so the image URL served to the
+        browser does not reveal the correct answer.
+
+        Args:
+            name (str): The organ name.
+
+        Returns:
+            str: A 16-character hex stem derived from the name.
+        """
+        return hashlib.sha1(name.encode()).hexdigest()[:16]
+
     def _load_quiz_data(self, file_path):
         """
         Loads the list of organs from the specified text file.
@@ -77,9 +148,31 @@ class HumanOrganQuiz:
         """
         self.app.route('/')(self.index)
         self.app.route('/get_question', methods=['GET'])(self.get_question_endpoint)
+        self.app.route('/get_questions', methods=['GET'])(self.get_questions_endpoint)
         self.app.route('/check_answer', methods=['POST'])(self.check_answer_endpoint)
         self.app.route('/static/<path:filename>')(self.serve_static)
 
+    def _pick_options(self):
+        """
+        Picks a correct organ and three distinct wrong options by index,
+        avoiding the per-question rebuild of a filtered candidate list.
+
+        Returns:
+            tuple: (correct_answer, shuffled list of four options).
+        """
+        ci = random.randrange(self._n)
+        # Sample four distinct indices; the spare fourth patches out the
+        # correct index if it happened to be drawn
+        picks = random.sample(range(self._n), 4)
+        if ci in picks:
+            picks[picks.index(ci)] = picks[-1]
+        picks = picks[:3]
+
+        # Combine and shuffle the options
+        options = [self.organs[i] for i in picks] + [self.organs[ci]]
+        random.shuffle(options)
+        return self.organs[ci], options
+
     def _get_new_question(self):
         """
         Generates a new quiz question with a correct answer and three incorrect options.
@@ -87,16 +180,9 @@ class HumanOrganQuiz:
         Returns:
             dict: A dictionary containing the correct organ and a shuffled list of options.
         """
-        # Select a correct answer randomly from the list of organs
-        correct_answer = random.choice(self.organs)
-        
-        # Select three other random organs as wrong options
-        wrong_options = random.sample([o for o in self.organs if o != correct_answer], 3)
-        
-        # Combine and shuffle the options
-        options = wrong_options + [correct_answer]
-        random.shuffle(options)
-        
+        # Pick the correct answer and options by index sampling
+        correct_answer, options = self._pick_options()
+
         # Store the correct answer in the user's session
         session['correct_answer'] = correct_answer
         
@@ -110,10 +196,84 @@ class HumanOrganQuiz:
         Renders and serves the main HTML page for the quiz.
 
         Returns:
-            str: The content of the 'index.html' file.
+            str: The content of the 'index.html' file, cached at startup.
         """
-        with open('index.html', 'r', encoding='utf-8') as f:
-            return f.read()
+        return self._index_html
+
+    def _generate_and_cache(self, organ):
+        """
+        Generates the image for an organ and files it in the per-organ
+        cache. Safe to call from worker threads; used by both the request
+        path and the startup warmer.
+
+        Args:
+            organ (str): The organ to generate an image for.
+
+        Returns:
+            str: The static-relative filename of the cached image.
+        """
+        # Single-flight: if another worker is already generating this organ,
+        # wait for it to finish and reuse its result instead of paying for a
+        # duplicate Bedrock invocation
+        while True:
+            with self._inflight_lock:
+                cached = self._img_cache.get(organ)
+                if cached:
+                    return cached
+                event = self._inflight.get(organ)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight[organ] = event
+                    break
+            # Another thread owns the generation; wait, then re-check the
+            # cache (looping makes a waiter take over if the owner failed).
+            # The timeout guards against orphaned entries: a process forked
+            # while a generation was in flight inherits events that no
+            # surviving thread will ever set. On timeout, drop the stale
+            # entry so the loop can re-claim ownership.
+            if not event.wait(timeout=60):
+                with self._inflight_lock:
+                    if self._inflight.get(organ) is event:
+                        self._inflight.pop(organ)
+
+        try:
+            return self._generate_and_cache_locked(organ)
+        finally:
+            with self._inflight_lock:
+                # Pop only our own entry; a waiter that timed out may have
+                # already replaced it with its own event
+                if self._inflight.get(organ) is event:
+                    self._inflight.pop(organ)
+            event.set()
+
+    def _generate_and_cache_locked(self, organ):
+        """
+        Performs the actual generation for _generate_and_cache; callers
+        must hold the single-flight slot for this organ.
+
+        Args:
+            organ (str): The organ to generate an image for.
+
+        Returns:
+            str: The static-relative filename of the cached image.
+        """
+        # Generate a prompt for the image generation model
+        prompt = f"A clear medical illustration of the human {organ.lower()}. " \
+                  "Do not include any text or labels. " \
+                  "Do not include scletal or bone structures if the organ or body part is external body part."
+
+        print(f"Generated prompt: {prompt}")
+
+        # Invoke the model to generate the image
+        image_path = self.img_gen.generate_image(prompt)
+
+        # Move the image into the per-organ cache and record the hit for
+        # every future question on this organ, keeping the extension the
+        # generator chose (normally .webp)
+        filename = f"cache/{self._cache_stem(organ)}{os.path.splitext(image_path)[1]}"
+        shutil.move(image_path, os.path.join('static', filename))
+        self._img_cache[organ] = filename
+        return filename
 
     def get_question_endpoint(self):
         """
@@ -126,42 +286,23 @@ class HumanOrganQuiz:
         """
         # Get a new question and store the correct answer in the session first.
         question_data = self._get_new_question()
+        organ = question_data['organ']
+
+        # Serve straight from the per-organ cache when possible; the stable
+        # filename also lets the browser reuse its own cached copy
+        cached = self._img_cache.get(organ)
+        if cached:
+            return jsonify({
+                'options': question_data['options'],
+                'image_url': f"/static/{cached}"
+            })
 
         try:
-            # Clean up the old image file if it exists from the previous session
-            if 'previous_image' in session and session['previous_image']:
-                old_image_path = os.path.join('static', session['previous_image'])
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-            
-            # Generate a prompt for the image generation model
-            prompt = f"A clear medical illustration of the human {question_data['organ'].lower()}. " \
-                      "Do not include any text or labels. " \
-                      "Do not include scletal or bone structures if the organ or body part is external body part."
-
-            print(f"Generated prompt: {prompt}")
-
-            self.img_gen.PromptGeneration(prompt)
-            
-            # Invoke the model to generate the image
-            response = self.img_gen.InvokeModel()
-            image_path = self.img_gen.ProcessResponse(response)
-            
-            # Generate a unique filename and move the generated image to the static directory
-            filename = f"{uuid.uuid4()}.png"
-            static_image_path = os.path.join('static', filename)
-            shutil.move(image_path, static_image_path)
-            
-            # Use a cache-busting query parameter to force the browser to refresh the image
-            cache_buster = int(time.time())
-            image_url = f"/static/{filename}?t={cache_buster}"
-            
-            # Store the new filename in the session for future cleanup
-            session['previous_image'] = filename
+            filename = self._generate_and_cache(organ)
 
             return jsonify({
                 'options': question_data['options'],
-                'image_url': image_url
+                'image_url': f"/static/{filename}"
             })
 
         except Exception as e:
@@ -174,6 +315,66 @@ class HumanOrganQuiz:
                 'image_url': '/static/placeholder.jpg'
             }), 500
 
+    def get_questions_endpoint(self):
+        """
+        Handles the '/get_questions' GET request. Prepares the next N
+        questions in one response so the client can render follow-up
+        questions without another round trip; missing images are generated
+        in one parallel fan-out instead of N serial calls. Each question
+        carries a qid that '/check_answer' uses to look up its answer.
+
+        Returns:
+            flask.Response: A JSON response with a list of question objects.
+        """
+        try:
+            count = max(1, min(int(request.args.get('n', 5)), 10))
+        except ValueError:
+            count = 5
+
+        # Build the question tuples and register their answers by qid
+        questions = []
+        answers = session.get('answers', {})
+        for _ in range(count):
+            correct_answer, options = self._pick_options()
+            qid = uuid.uuid4().hex[:8]
+            answers[qid] = correct_answer
+            questions.append({'qid': qid, 'organ': correct_answer, 'options': options})
+
+        # Keep only the most recent answers so the session cookie stays small
+        if len(answers) > 40:
+            answers = dict(list(answers.items())[-40:])
+        session['answers'] = answers
+
+        # Fan out image generation for cache misses in parallel
+        misses = {q['organ'] for q in questions if q['organ'] not in self._img_cache}
+        if misses:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(misses)) as pool:
+                list(pool.map(self._generate_quietly, misses))
+
+        payload = []
+        for question in questions:
+            filename = self._img_cache.get(question['organ'])
+            payload.append({
+                'qid': question['qid'],
+                'options': question['options'],
+                'image_url': f"/static/{filename}" if filename else '/static/placeholder.jpg'
+            })
+        return jsonify({'questions': payload})
+
+    def _generate_quietly(self, organ):
+        """
+        Runs _generate_and_cache and swallows failures so one blocked
+        prompt cannot sink a whole batch; the affected question falls back
+        to the placeholder image.
+
+        Args:
+            organ (str): The organ to generate an image for.
+        """
+        try:
+            self._generate_and_cache(organ)
+        except Exception as e:
+            print(f"Error during image generation: {e}")
+
     def check_answer_endpoint(self):
         """
         Handles the '/check_answer' POST request. It checks if the selected option
@@ -184,9 +385,14 @@ class HumanOrganQuiz:
         """
         data = request.json
         selected_option = data.get('selected_option')
-        
-        # Check if there is an active question
-        correct_answer = session.get('correct_answer')
+        qid = data.get('qid')
+
+        # Batched questions carry a qid; fall back to the single-question
+        # session key otherwise
+        if qid:
+            correct_answer = session.get('answers', {}).get(qid)
+        else:
+            correct_answer = session.get('correct_answer')
         if not correct_answer:
             # If the correct answer is not in the session, it means the state is invalid.
             return jsonify({'error': 'No active question. Please get a new question.'}), 400
@@ -211,11 +417,21 @@ class HumanOrganQuiz:
         Returns:
             flask.Response: The static file content.
         """
-        return send_from_directory('static', filename)
+        # Image filenames are immutable (unique per question or stable per
+        # organ), so let the browser cache aggressively; send_from_directory
+        # already emits ETag/Last-Modified for conditional requests.
+        response = send_from_directory('static', filename)
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+        return response
 
     def run(self):
         """
-        Starts the Flask development server.
+        Starts the Flask development server. Production runs use gunicorn
+        with gevent workers instead (see quiz.service): the dev server
+        handles one request at a time, which is fatal while a Bedrock
+        call is in flight.
         """
         # The 'debug=False' setting is for production, 'host' and 'port'
         # make the server accessible externally.
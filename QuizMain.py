@@ -1,241 +1,405 @@
-###############################################################################
-# Human Organ Quiz UI
-#
-# Desc: This script provides a Tkinter-based GUI for a human organ quiz game.
-#       It uses AWSImgGen to generate images of human organs and quizzes the user
-#       with multiple-choice questions. The UI manages user interaction, answer
-#       checking, and feedback display.
-#
-# Author: Dipesh Karmakar
-# Date: 07/08/2025
-# License: MIT License
-###############################################################################
-
-# Import necessary libraries
-import tkinter as tk
-from tkinter import messagebox
-from tkinter import ttk
-from PIL import Image, ImageTk
-import random
-import os
-import sys
-
-# Import your AWSImgGen class
-from AWSImgGen import AWSImgGen
-
-class QuizUI:
-    """
-    QuizUI creates a simple quiz interface for human body organs using AWSImgGen to generate images.
-    Handles UI creation, question generation, answer checking, and feedback.
-    """
-    def __init__(self, root, quiz_file):
-        """
-        Initializes the QuizUI object, sets up the main window, variables, and starts the first question.
-        Args:
-            root (tk.Tk): The main Tkinter window.
-        """
-        self.root = root
-        # List of human organs for quiz
-        self.ORGANS = self.load_quiz_data(quiz_file)
-        self.root.title("Human Organ Quiz")
-        # --- CHANGE: Increased the window size
-        self.root.geometry("700x850")
-        # --- CHANGE: Disabled the window resizing and the maximize button
-        self.root.resizable(False, False)
-        self.img_gen = AWSImgGen()
-        self.correct_answer = None
-        self.options = []
-        self.selected_option = tk.StringVar()
-        self.selected_option.trace_add("write", self.on_option_selected)
-        self.image_label = None
-
-        # UI Elements
-        self.create_widgets()
-        self.next_question()
-
-    def load_quiz_data(self, filename):
-        """
-        Function to open the quiz data file and populate the list data structure.
-        Args:
-            filename (str): The path to the quiz data file.
-        """
-        with open(filename, "r", encoding="utf-8") as f:
-            # Remove empty lines and strip whitespace
-            return [line.strip() for line in f if line.strip()]
-
-    def create_widgets(self):
-        """
-        Creates and packs all the widgets for the quiz UI, including image display,
-        radio buttons for options, control buttons, and status label.
-        """
-        # Image display section
-        # --- CHANGE: Increased the size of the image placeholder
-        self.image_label = tk.Label(self.root, text="Loading image...", width=600, height=450, font=("Arial", 20))
-        self.image_label.pack(pady=20)
-
-        # Radio buttons for options
-        self.radio_buttons = []
-        # --- CHANGE: Created a new style with a larger font for radio buttons
-        style = ttk.Style()
-        style.configure('T.TRadiobutton', font=('Helvetica', 16))
-        for i in range(4):
-            # --- CHANGE: Applied the new style
-            rb = ttk.Radiobutton(self.root, text="", variable=self.selected_option, value="", style='T.TRadiobutton')
-            rb.pack(anchor='w', padx=40, pady=10)
-            self.radio_buttons.append(rb)
-
-        # Check and Next buttons
-        button_frame = tk.Frame(self.root)
-        button_frame.pack(pady=20)
-
-        # --- CHANGE: Increased button width and font size
-        self.check_button = tk.Button(button_frame, text="Check", command=self.check_answer, width=15, font=("Arial", 16))
-        self.check_button.grid(row=0, column=0, padx=10)
-
-        # --- CHANGE: Increased button width and font size
-        self.next_button = tk.Button(button_frame, text="Next", command=self.next_question, width=15, font=("Arial", 16))
-        self.next_button.grid(row=0, column=1, padx=10)
-
-        # Add a status label for messages
-        # --- CHANGE: Increased the font size
-        # --- CHANGE: Increased the font size and repositioned it to be above the buttons
-        self.status_label = tk.Label(self.root, text="", fg="blue", font=("Arial", 18))
-        self.status_label.pack(pady=20)
-
-    def next_question(self):
-        """
-        Generates a new quiz question, disables/enables appropriate buttons,
-        generates a new image using AWSImgGen, and updates the UI.
-        Handles image/content blocking by retrying with a new organ if needed.
-        """
-        # Immediately disable the Next button to prevent double clicks
-        self.next_button.config(state="disabled")
-        self.check_button.config(state="disabled")   # Start as disabled
-        self.status_label.config(text="Wait for preparing the Quiz...")
-        self.root.update()
-
-        # Enable all radio buttons for the new question
-        for rb in self.radio_buttons:
-            rb.config(state="normal")
-
-        while True:
-            try:
-                # Randomly select an organ as the correct answer
-                self.correct_answer = random.choice(self.ORGANS)
-                # Generate 3 random wrong options
-                wrong_options = random.sample([o for o in self.ORGANS if o != self.correct_answer], 3)
-                # Combine and shuffle options
-                self.options = wrong_options + [self.correct_answer]
-                random.shuffle(self.options)
-                self.selected_option.set(None)
-
-                # Update radio button texts and values
-                for i, rb in enumerate(self.radio_buttons):
-                    rb.config(text=self.options[i], value=self.options[i])
-
-                # Generate new image using AWSImgGen
-                prompt = f"A clear medical illustration of the human {self.correct_answer.lower()}."
-                self.img_gen.PromptGeneration(prompt)
-                response = self.img_gen.InvokeModel()
-                image_path = self.img_gen.ProcessResponse(response)
-
-                # Display the image
-                self.display_image(image_path)
-
-                # Remove waiting message and enable Next button
-                self.status_label.config(text="")
-                break  # Exit loop if successful
-
-            except Exception as e:
-                # If blocked or any error, try another organ
-                self.status_label.config(text="Blocked or error, generating another image...")
-                self.root.update()
-                continue
-
-    def display_image(self, image_path):
-        """
-        Opens and resizes the generated image, then displays it in the UI.
-        Args:
-            image_path (str): The file path of the image to display.
-        """
-        img = Image.open(image_path)
-        # Use LANCZOS instead of ANTIALIAS
-        # --- CHANGE: Resized the image to fit the larger window
-        img = img.resize((600, 450), Image.Resampling.LANCZOS)
-        photo = ImageTk.PhotoImage(img)
-        self.image_label.configure(image=photo, text="")
-        self.image_label.image = photo  # Keep a reference
-
-    def check_answer(self):
-        """
-        Checks if the selected option is correct, shows feedback, and manages button states.
-        Disables all option buttons and enables Next only after a correct answer.
-        """
-        selected = self.selected_option.get()
-        print(f"Selected: {selected}, Correct: {self.correct_answer}")  # Debugging line
-        if selected == None or selected == "" or selected not in self.options:
-            self.show_custom_message("Select an option", "Please select an answer before checking.")
-            print("No option selected.")
-            return
-        if selected == self.correct_answer:
-            self.check_button.config(state="disabled")
-            self.next_button.config(state="normal")  # Enable Next only after correct answer
-            # Disable all radio buttons after correct answer
-            for rb in self.radio_buttons:
-                rb.config(state="disabled")
-            self.show_custom_message("Congratulations!", "Correct! Well done!")
-        else:
-            self.show_custom_message("Try Again", f"Incorrect. The correct answer was: {self.correct_answer}")
-
-    def show_custom_message(self, title, message):
-        """
-        Shows a custom popup message at the same coordinates as the main window.
-        Args:
-            title (str): The title of the popup window.
-            message (str): The message to display.
-        """
-        x = self.root.winfo_x()
-        y = self.root.winfo_y()
-        # Create a new top-level window
-        popup = tk.Toplevel(self.root)
-        popup.title(title)
-        popup.geometry(f"+{x+80}+{y+80}")  # Offset a bit so it's not exactly overlapping
-        popup.transient(self.root)
-        popup.grab_set()
-        popup.resizable(False, False)
-
-        # --- CHANGE: Increased the font size of the popup message label
-        label = tk.Label(popup, text=message, font=("Arial", 16), padx=20, pady=20)
-        label.pack()
-
-        # --- CHANGE: Increased the button width and font size
-        ok_button = tk.Button(popup, text="OK", width=15, font=("Arial", 14), command=popup.destroy)
-        ok_button.pack(pady=(0, 10))
-
-        # Make sure the popup is on top
-        popup.attributes('-topmost', True)
-        popup.focus_force()
-
-    def on_option_selected(self, *args):
-        """
-        Callback for when a radio button is selected.
-        Enables the Check button only if an option is selected.
-        """
-        if self.selected_option.get():
-            self.check_button.config(state="normal")
-        else:
-            self.check_button.config(state="disabled")
-
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        quiz_file = sys.argv[1]
-    else:
-        # Fallback to the default hard-coded value if no argument is provided
-        quiz_file = "QuizData_1.txt"
-
-    # List of human organs for quiz
-    root = tk.Tk()
-    # Create the QuizUI instance
-    app = QuizUI(root, quiz_file)
-    # Start the Tkinter event loop
+###############################################################################
+# Human Organ Quiz UI
+#
+# Desc: This script provides a Tkinter-based GUI for a human organ quiz game.
+#       It uses AWSImgGen to generate images of human organs and quizzes the user
+#       with multiple-choice questions. The UI manages user interaction, answer
+#       checking, and feedback display.
+#
+# Author: Dipesh Karmakar
+# Date: 07/08/2025
+# License: MIT License
+###############################################################################
+
+# Import necessary libraries
+import tkinter as tk
+from tkinter import messagebox
+from tkinter import ttk
+from PIL import Image, ImageTk
+import collections
+import concurrent.futures
+import io
+import random
+import os
+import sys
+import threading
+import time
+import logging
+from botocore.exceptions import ClientError
+
+# Import your AWSImgGen class
+from AWSImgGen import AWSImgGen
+
+# Module logger; silent unless the application configures logging
+logger = logging.getLogger(__name__)
+
+class QuizUI:
+    """
+    QuizUI creates a simple quiz interface for human body organs using AWSImgGen to generate images.
+    Handles UI creation, question generation, answer checking, and feedback.
+    """
+    def __init__(self, root, quiz_file):
+        """
+        Initializes the QuizUI object, sets up the main window, variables, and starts the first question.
+        Args:
+            root (tk.Tk): The main Tkinter window.
+        """
+        self.root = root
+        # List of human organs for quiz
+        self.ORGANS = self.load_quiz_data(quiz_file)
+        # Precompute the wrong-option candidates per organ once, so each
+        # question avoids rebuilding a filtered list
+        self._wrong_candidates = {o: tuple(x for x in self.ORGANS if x != o) for o in self.ORGANS}
+        self.root.title("Human Organ Quiz")
+        # --- CHANGE: Increased the window size
+        self.root.geometry("700x850")
+        # --- CHANGE: Disabled the window resizing and the maximize button
+        self.root.resizable(False, False)
+        # Construct the boto3-backed generator off the Tk thread: client
+        # setup costs hundreds of ms and would otherwise delay the first
+        # paint of the window. Workers wait on the event before generating.
+        self.img_gen = None
+        self._gen_ready = threading.Event()
+        threading.Thread(target=self._init_gen, daemon=True).start()
+        self.correct_answer = None
+        self.options = []
+        self.selected_option = tk.StringVar()
+        self.selected_option.trace_add("write", self.on_option_selected)
+        self.image_label = None
+
+        # Thread pool and queue used to generate upcoming questions in the
+        # background so the UI never blocks on a Bedrock round-trip
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        self.prefetch = collections.deque()
+        # Ready-to-show PhotoImage per organ; repeats skip generation and
+        # decoding entirely. Bounded by the organ list (~1 MiB per entry).
+        self._photo_cache = {}
+        # Front/back PhotoImage slots for flicker-free swaps
+        self._front_photo = None
+        self._back_photo = None
+
+        # UI Elements
+        self.create_widgets()
+
+        # Work ahead of the user: keep a few questions in flight so the next
+        # image is (usually) already generated by the time it is needed
+        for _ in range(3):
+            self.prefetch.append(self.pool.submit(self._generate_question))
+        self.next_question()
+
+    def load_quiz_data(self, filename):
+        """
+        Function to open the quiz data file and populate the list data structure.
+        Args:
+            filename (str): The path to the quiz data file.
+        """
+        with open(filename, "r", encoding="utf-8") as f:
+            # Remove empty lines and strip whitespace
+            return [line.strip() for line in f if line.strip()]
+
+    def _init_gen(self):
+        """
+        Builds the AWSImgGen instance on a background thread and signals
+        the prefetch workers once it is ready.
+        """
+        # Single image per Bedrock call: the per-organ PhotoImage cache
+        # and the persistent prompt cache mean each prompt is generated at
+        # most once per install, so a larger batch would just bill for
+        # surplus images that nothing ever consumes
+        self.img_gen = AWSImgGen()
+        self._gen_ready.set()
+
+    def create_widgets(self):
+        """
+        Creates and packs all the widgets for the quiz UI, including image display,
+        radio buttons for options, control buttons, and status label.
+        """
+        # Image display section
+        # --- CHANGE: Increased the size of the image placeholder
+        self.image_label = tk.Label(self.root, text="Loading image...", width=600, height=450, font=("Arial", 20))
+        self.image_label.pack(pady=20)
+
+        # Radio buttons for options
+        self.radio_buttons = []
+        # --- CHANGE: Created a new style with a larger font for radio buttons
+        style = ttk.Style()
+        style.configure('T.TRadiobutton', font=('Helvetica', 16))
+        for i in range(4):
+            # --- CHANGE: Applied the new style
+            rb = ttk.Radiobutton(self.root, text="", variable=self.selected_option, value="", style='T.TRadiobutton')
+            rb.pack(anchor='w', padx=40, pady=10)
+            self.radio_buttons.append(rb)
+
+        # Check and Next buttons
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(pady=20)
+
+        # --- CHANGE: Increased button width and font size
+        self.check_button = tk.Button(button_frame, text="Check", command=self.check_answer, width=15, font=("Arial", 16))
+        self.check_button.grid(row=0, column=0, padx=10)
+
+        # --- CHANGE: Increased button width and font size
+        self.next_button = tk.Button(button_frame, text="Next", command=self.next_question, width=15, font=("Arial", 16))
+        self.next_button.grid(row=0, column=1, padx=10)
+
+        # Add a status label for messages
+        # --- CHANGE: Increased the font size
+        # --- CHANGE: Increased the font size and repositioned it to be above the buttons
+        self.status_label = tk.Label(self.root, text="", fg="blue", font=("Arial", 18))
+        self.status_label.pack(pady=20)
+
+    def _generate_question(self):
+        """
+        Background worker that prepares one complete question: picks an organ
+        and generates its image via AWSImgGen. Runs on the prefetch pool so
+        the Bedrock round-trip never blocks the Tk main thread.
+        Handles image/content blocking by retrying with a new organ if needed.
+
+        Returns:
+            tuple: (organ, pil_image) for a successfully generated question,
+            with the image already decoded and resized for display.
+        """
+        for attempt in range(6):
+            try:
+                # Randomly select an organ as the correct answer
+                return self._generate_for(random.choice(self.ORGANS))
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code", "")
+                if code in ("ThrottlingException", "TooManyRequestsException",
+                            "ServiceQuotaExceededException"):
+                    # Back off exponentially with jitter; retrying a
+                    # throttled endpoint immediately only begets more
+                    # throttling
+                    time.sleep(2 ** attempt * 0.1 + random.random() * 0.1)
+                    continue
+                # Content-filter rejection or another client error: fall
+                # through and try different organs without sleeping
+            except Exception as e:
+                # Transient failure; fall through and try different organs
+                pass
+
+            # Try two fresh candidates inline. Do NOT submit them to
+            # self.pool: this method already runs on that pool, and under a
+            # correlated failure (outage, bad credentials) every worker
+            # lands here at once and would block forever on sub-futures
+            # that can no longer be scheduled.
+            for organ in random.sample(self.ORGANS, 2):
+                try:
+                    return self._generate_for(organ)
+                except Exception:
+                    continue
+            # Both fresh candidates failed; next attempt picks new organs
+
+        raise RuntimeError("Image generation failed after repeated attempts")
+
+    def _generate_for(self, organ):
+        """
+        Generates and prepares the display image for one specific organ.
+        Runs in the prefetch pool; safe to call from multiple threads.
+        Args:
+            organ (str): The organ to generate an image for.
+
+        Returns:
+            tuple: (organ, pil_image) ready for display.
+        """
+        # Repeat organ: the PhotoImage cache already holds its display
+        # image, so skip generation and decoding altogether
+        if organ in self._photo_cache:
+            return organ, None
+
+        # Wait until the background construction of AWSImgGen finishes
+        self._gen_ready.wait()
+        # Generate new image using AWSImgGen (thread-safe). The bytes
+        # variant skips the PNG write+re-read round-trip; persistence
+        # happens on AWSImgGen's background writer.
+        prompt = f"A clear medical illustration of the human {organ.lower()}."
+        image_data = self.img_gen.generate_image_data(prompt)
+        # Decode and resize here in the worker so the Tk main thread
+        # only has to wrap the finished image in a PhotoImage
+        return organ, self._decode_resize(image_data)
+
+    def _decode_resize(self, image_data):
+        """
+        Decodes and resizes a generated image for display. Runs in the
+        prefetch worker, off the Tk main thread.
+        Args:
+            image_data (bytes): The in-memory PNG data to prepare.
+
+        Returns:
+            PIL.Image.Image: The resized image ready for display.
+        """
+        img = Image.open(io.BytesIO(image_data))
+        # draft lets JPEG sources decode directly at reduced scale; it is a
+        # free no-op for PNG/WebP, so always ask
+        img.draft("RGB", (600, 450))
+        # thumbnail resizes in place with an internal fast-reduce pass and
+        # keeps the aspect ratio instead of stretching to 600x450.
+        # BILINEAR: at this mild downscale it is visually indistinguishable
+        # from LANCZOS and ~3x faster
+        img.thumbnail((600, 450), Image.Resampling.BILINEAR)
+        return img
+
+    def next_question(self):
+        """
+        Takes the next prefetched question from the queue, disables/enables
+        appropriate buttons, resubmits a replacement so the pool keeps
+        working ahead of the user, and updates the UI.
+        """
+        # Immediately disable the Next button to prevent double clicks
+        self.next_button.config(state="disabled")
+        self.check_button.config(state="disabled")   # Start as disabled
+        self.status_label.config(text="Wait for preparing the Quiz...")
+        self.root.update()
+
+        # Enable all radio buttons for the new question
+        for rb in self.radio_buttons:
+            rb.config(state="normal")
+
+        # Take the oldest in-flight question and immediately submit a
+        # replacement so there are always a few being generated
+        future = self.prefetch.popleft()
+        self.prefetch.append(self.pool.submit(self._generate_question))
+
+        if future.done():
+            # Steady state: the image is already prepared, show it now
+            self._present_question(future)
+        else:
+            # Still generating: hand the result back to the Tk thread via
+            # root.after once the worker finishes, instead of blocking the
+            # event loop on future.result()
+            future.add_done_callback(
+                lambda f: self.root.after(0, self._present_question, f))
+
+    def _present_question(self, future):
+        """
+        Fills in the options and image for a completed question. Always runs
+        on the Tk main thread (directly or via root.after).
+        Args:
+            future (concurrent.futures.Future): The finished question future.
+        """
+        try:
+            self.correct_answer, pil_img = future.result()
+        except Exception:
+            # Generation gave up after its retry budget. Keep the UI
+            # usable: report the failure and re-enable Next so the user
+            # can retry (next_question already queued a replacement task
+            # when it handed us this future).
+            logger.exception("Question preparation failed")
+            self.status_label.config(
+                text="Could not generate an image. Press Next to retry.")
+            self.next_button.config(state="normal")
+            return
+
+        # Generate 3 random wrong options from the precomputed candidates
+        wrong_options = random.sample(self._wrong_candidates[self.correct_answer], 3)
+        # Combine and shuffle options
+        self.options = wrong_options + [self.correct_answer]
+        random.shuffle(self.options)
+        self.selected_option.set(None)
+
+        # Update radio button texts and values
+        for i, rb in enumerate(self.radio_buttons):
+            rb.config(text=self.options[i], value=self.options[i])
+
+        # Display the image
+        self.display_image(pil_img)
+
+        # Remove waiting message
+        self.status_label.config(text="")
+
+    def display_image(self, pil_img):
+        """
+        Displays an already decoded and resized image in the UI. The heavy
+        decode/resize work happens in the prefetch worker; only the cheap
+        PhotoImage conversion runs on the Tk main thread, and its result is
+        cached per organ so repeats are a dict lookup.
+        Args:
+            pil_img (PIL.Image.Image): The resized image to display, or
+                None when the current organ is already in the cache.
+        """
+        photo = self._photo_cache.get(self.correct_answer)
+        if photo is None:
+            photo = ImageTk.PhotoImage(pil_img)
+            self._photo_cache[self.correct_answer] = photo
+        # Double-buffer: the incoming surface is fully built before the
+        # single configure call, and the outgoing one stays referenced in
+        # the front slot until after the swap, so Tk never tears down the
+        # displayed image ahead of its replacement (no blank frame)
+        self._back_photo = photo
+        self.image_label.configure(image=self._back_photo, text="")
+        self._front_photo, self._back_photo = self._back_photo, self._front_photo
+        self.image_label.image = self._front_photo  # Keep a reference
+
+    def check_answer(self):
+        """
+        Checks if the selected option is correct, shows feedback, and manages button states.
+        Disables all option buttons and enables Next only after a correct answer.
+        """
+        selected = self.selected_option.get()
+        logger.debug("Selected: %s, Correct: %s", selected, self.correct_answer)
+        if selected == None or selected == "" or selected not in self.options:
+            self.show_custom_message("Select an option", "Please select an answer before checking.")
+            logger.debug("No option selected.")
+            return
+        if selected == self.correct_answer:
+            self.check_button.config(state="disabled")
+            self.next_button.config(state="normal")  # Enable Next only after correct answer
+            # Disable all radio buttons after correct answer
+            for rb in self.radio_buttons:
+                rb.config(state="disabled")
+            self.show_custom_message("Congratulations!", "Correct! Well done!")
+        else:
+            self.show_custom_message("Try Again", f"Incorrect. The correct answer was: {self.correct_answer}")
+
+    def show_custom_message(self, title, message):
+        """
+        Shows a custom popup message at the same coordinates as the main window.
+        Args:
+            title (str): The title of the popup window.
+            message (str): The message to display.
+        """
+        x = self.root.winfo_x()
+        y = self.root.winfo_y()
+        # Create a new top-level window
+        popup = tk.Toplevel(self.root)
+        popup.title(title)
+        popup.geometry(f"+{x+80}+{y+80}")  # Offset a bit so it's not exactly overlapping
+        popup.transient(self.root)
+        popup.grab_set()
+        popup.resizable(False, False)
+
+        # --- CHANGE: Increased the font size of the popup message label
+        label = tk.Label(popup, text=message, font=("Arial", 16), padx=20, pady=20)
+        label.pack()
+
+        # --- CHANGE: Increased the button width and font size
+        ok_button = tk.Button(popup, text="OK", width=15, font=("Arial", 14), command=popup.destroy)
+        ok_button.pack(pady=(0, 10))
+
+        # Make sure the popup is on top
+        popup.attributes('-topmost', True)
+        popup.focus_force()
+
+    def on_option_selected(self, *args):
+        """
+        Callback for when a radio button is selected.
+        Enables the Check button only if an option is selected.
+        """
+        if self.selected_option.get():
+            self.check_button.config(state="normal")
+        else:
+            self.check_button.config(state="disabled")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        quiz_file = sys.argv[1]
+    else:
+        # Fallback to the default hard-coded value if no argument is provided
+        quiz_file = "QuizData_1.txt"
+
+    # List of human organs for quiz
+    root = tk.Tk()
+    # Create the QuizUI instance
+    app = QuizUI(root, quiz_file)
+    # Start the Tkinter event loop
     root.mainloop()
\ No newline at end of file
@@ -16,9 +16,10 @@ import os
 import sys
 import random
 import json
+import queue
 import shutil
+import threading
 import uuid
-import time
 from flask import Flask, request, jsonify, session, send_from_directory
 # NOTE: The AWSImgGen class is assumed to be defined in a separate file.
 from AWSImgGen import AWSImgGen
@@ -38,17 +39,53 @@ class StructuresOfWondersQuiz:
         """
         # Initialize the Flask application
         self.app = Flask(__name__)
-        self.app.secret_key = os.urandom(24)
+        # Stable secret so every gunicorn worker validates the same session
+        # cookies; quiz.service provides QUIZ_SECRET_KEY. The random
+        # fallback is for single-process development runs only.
+        self.app.secret_key = os.environ.get('QUIZ_SECRET_KEY') or os.urandom(24)
+
+        # Server-side sessions: when REDIS_URL is set (and flask-session is
+        # installed), session state lives in Redis and the cookie carries
+        # only a session id, instead of HMAC-signing and round-tripping a
+        # growing JSON blob on every request. Cookie sessions remain the
+        # fallback so the app still runs without Redis.
+        redis_url = os.environ.get('REDIS_URL')
+        if redis_url:
+            try:
+                import redis
+                from flask_session import Session
+                self.app.config['SESSION_TYPE'] = 'redis'
+                self.app.config['SESSION_REDIS'] = redis.Redis.from_url(redis_url)
+                self.app.config['PERMANENT_SESSION_LIFETIME'] = 600
+                Session(self.app)
+            except ImportError:
+                print("REDIS_URL is set but redis/flask-session is not installed; using cookie sessions.")
 
         # Create an instance of the AWS Image Generation class with region name
         self.img_gen = AWSImgGen("ap-south-1")
 
-        # Load the list of structures of wonders from a file
-        self.structures = self._load_quiz_data(quiz_data_file)
+        # Load the list of structures of wonders from a file. The list is
+        # immutable after load, so store it as a tuple and sample by index.
+        self.structures = tuple(self._load_quiz_data(quiz_data_file))
+        self._n = len(self.structures)
         
         # Ensure the static directory exists for serving images
-        if not os.path.exists('static'):
-            os.makedirs('static')
+        os.makedirs('static', exist_ok=True)
+
+        # Stale images are unlinked by a daemon janitor thread fed through
+        # this queue, keeping disk syscalls off the request path. The
+        # thread is started lazily on first use rather than here: a thread
+        # started at import time would not survive a fork into gunicorn
+        # workers, leaving each worker's queue to fill with paths that
+        # nothing ever deletes.
+        self._gc_queue = queue.Queue()
+        self._gc_thread = None
+        self._gc_thread_lock = threading.Lock()
+
+        # Read the quiz page once at startup; index() serves the cached
+        # string instead of re-reading the file per request
+        with open('index.html', 'r', encoding='utf-8') as f:
+            self._index_html = f.read()
 
         # Register the routes with the Flask application
         self._register_routes()
@@ -72,6 +109,33 @@ class StructuresOfWondersQuiz:
             print(f"{file_path} not found. Using default structures list.")
             return ["Colosseum", "Taj Mahal", "Machu Picchu", "Great Wall of China", "Eiffel Tower"]
 
+    def _discard(self, path):
+        """
+        Queues a file for background deletion, starting the janitor thread
+        in the current process on first use.
+
+        Args:
+            path (str): The file path to delete.
+        """
+        if self._gc_thread is None:
+            with self._gc_thread_lock:
+                if self._gc_thread is None:
+                    self._gc_thread = threading.Thread(target=self._gc_worker, daemon=True)
+                    self._gc_thread.start()
+        self._gc_queue.put(path)
+
+    def _gc_worker(self):
+        """
+        Daemon loop that removes files queued for deletion.
+        """
+        while True:
+            path = self._gc_queue.get()
+            try:
+                os.remove(path)
+            except OSError:
+                # Already gone; nothing to do
+                pass
+
     def _register_routes(self):
         """
         Binds the class methods to the Flask application routes.
@@ -88,16 +152,18 @@ class StructuresOfWondersQuiz:
         Returns:
             dict: A dictionary containing the correct structure and a shuffled list of options.
         """
-        # Select a correct answer randomly from the list of structures
-        correct_answer = random.choice(self.structures)
-        
-        # Select three other random structures as wrong options
-        wrong_options = random.sample([o for o in self.structures if o != correct_answer], 3)
-        
+        # Select the correct answer by index, then draw three wrong indices
+        # from the n-1 remaining slots; remapping them around the correct
+        # index skips the per-question equality filter and list rebuild
+        ci = random.randrange(self._n)
+        others = random.sample(range(self._n - 1), 3)
+        correct_answer = self.structures[ci]
+
         # Combine and shuffle the options
-        options = wrong_options + [correct_answer]
+        options = [self.structures[i if i < ci else i + 1] for i in others]
+        options.append(correct_answer)
         random.shuffle(options)
-        
+
         # Store the correct answer in the user's session
         session['correct_answer'] = correct_answer
         
@@ -111,10 +177,9 @@ class StructuresOfWondersQuiz:
         Renders and serves the main HTML page for the quiz.
 
         Returns:
-            str: The content of the 'index.html' file.
+            str: The content of the 'index.html' file, cached at startup.
         """
-        with open('index.html', 'r', encoding='utf-8') as f:
-            return f.read()
+        return self._index_html
 
     def get_question_endpoint(self):
         """
@@ -129,12 +194,10 @@ class StructuresOfWondersQuiz:
         question_data = self._get_new_question()
 
         try:
-            # Clean up the old image file if it exists from the previous session
+            # Queue the previous session's image for background deletion
             if 'previous_image' in session and session['previous_image']:
-                old_image_path = os.path.join('static', session['previous_image'])
-                if os.path.exists(old_image_path):
-                    os.remove(old_image_path)
-            
+                self._discard(os.path.join('static', session['previous_image']))
+
             # Generate a prompt for the image generation model
             prompt = f"A beautiful real life picture of the {question_data['structure'].lower()}. " \
                       "Do not include any text or labels. " \
@@ -145,14 +208,16 @@ class StructuresOfWondersQuiz:
             # Invoke the model to generate the image
             image_path = self.img_gen.generate_image(prompt)
             
-            # Generate a unique filename and move the generated image to the static directory
-            filename = f"{uuid.uuid4()}.png"
+            # Generate a unique filename and move the generated image to the
+            # static directory, keeping the extension the generator chose
+            # (normally .webp, .png on the re-encode fallback)
+            filename = f"{uuid.uuid4()}{os.path.splitext(image_path)[1]}"
             static_image_path = os.path.join('static', filename)
             shutil.move(image_path, static_image_path)
-            
-            # Use a cache-busting query parameter to force the browser to refresh the image
-            cache_buster = int(time.time())
-            image_url = f"/static/{filename}?t={cache_buster}"
+
+            # The filename is unique per question, so the URL itself is
+            # immutable and needs no cache-busting query parameter
+            image_url = f"/static/{filename}"
             
             # Store the new filename in the session for future cleanup
             session['previous_image'] = filename
@@ -209,11 +274,21 @@ class StructuresOfWondersQuiz:
         Returns:
             flask.Response: The static file content.
         """
-        return send_from_directory('static', filename)
+        # Image filenames are immutable (unique per question or stable per
+        # organ), so let the browser cache aggressively; send_from_directory
+        # already emits ETag/Last-Modified for conditional requests.
+        response = send_from_directory('static', filename)
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+        return response
 
     def run(self):
         """
-        Starts the Flask development server.
+        Starts the Flask development server. Production runs use gunicorn
+        with gevent workers instead (see quiz.service): the dev server
+        handles one request at a time, which is fatal while a Bedrock
+        call is in flight.
         """
         # The 'debug=False' setting is for production, 'host' and 'port'
         # make the server accessible externally.